@@ -2,7 +2,8 @@
 This module provides functions to interact with a PostgreSQL database for tracking soil moisture data.
 Functions:
     get_connection():
-        Establishes and returns a new connection to the PostgreSQL database using environment variables for configuration.
+        Context manager that borrows a connection from a shared, lazily-created connection pool
+        configured from environment variables, and returns it to the pool afterwards.
     get_last_processed_date():
         Retrieves the most recent 'last_date' entry from the 'soil_state' table.
         Returns:
@@ -15,7 +16,21 @@ Functions:
 """
 
 import os
+import atexit
+from contextlib import contextmanager
+from functools import lru_cache
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+db_host = os.getenv("DB_HOST")
+db_port = os.getenv("DB_PORT")
+db_name = os.getenv("DB_NAME")
+db_user = os.getenv("DB_USER")
+db_pass = os.getenv("DB_PASS")
 
 
 def create_table_if_missing():
@@ -47,10 +62,46 @@ def create_table_if_missing():
             conn.commit()
 
 
+@lru_cache(maxsize=1)
+def _get_pool():
+    """
+    Returns the shared connection pool, creating it on first use and closing it at process exit.
+    """
+    pool = ThreadedConnectionPool(
+        minconn=1,
+        maxconn=8,
+        host=db_host,
+        port=db_port,
+        dbname=db_name,
+        user=db_user,
+        password=db_pass,
+    )
+    atexit.register(pool.closeall)
+    return pool
+
+
+def _is_alive(conn):
+    """
+    Returns whether a pooled connection still reaches the server; the scheduler can leave it idle
+    for days, long enough for a server restart or an idle timeout to drop it.
+    """
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
 def get_connection():
     """
-    Establishes and returns a connection to a PostgreSQL database using credentials and connection details
-    retrieved from environment variables.
+    Borrows a connection to a PostgreSQL database from a shared connection pool, so repeated
+    queries do not pay a new TCP + auth handshake each time. The pool is configured from
+    environment variables read once at import.
 
     Environment Variables:
         DB_HOST (str): The hostname of the database server.
@@ -59,19 +110,23 @@ def get_connection():
         DB_USER (str): The username used to authenticate with the database.
         DB_PASS (str): The password used to authenticate with the database.
 
-    Returns:
-        psycopg2.extensions.connection: A new database connection object.
+    Yields:
+        psycopg2.extensions.connection: A pooled database connection, returned to the pool on exit.
+        Uncommitted work is rolled back when the connection is returned. A connection that no longer
+        answers is discarded and replaced by a fresh one before being handed out.
 
     Raises:
         psycopg2.OperationalError: If the connection to the database fails.
     """
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASS"),
-    )
+    pool = _get_pool()
+    conn = pool.getconn()
+    if not _is_alive(conn):
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
 
 
 def get_last_processed_date():
@@ -90,26 +145,28 @@ def get_last_processed_date():
 
 def set_last_processed(moisture_data):
     """
-    Inserts a new record into the 'vv_dB' table with the provided date and moisture value.
+    Upserts the provided rows into the 'vv_data' table in a single batched statement.
 
     Args:
-        date_str (str): The date string representing the last processed date.
-        moisture_value (float): The soil moisture value to be stored.
+        moisture_data (list[dict]): Rows with "date", "vv_dB" and "description" keys.
 
     Raises:
         Exception: If there is an error during database insertion.
     """
+    # One statement cannot upsert the same date twice; keep the last row per date as the old per-row loop did
+    rows = list({entry["date"]: (entry["date"], entry["vv_dB"], entry["description"]) for entry in moisture_data}.values())
     with get_connection() as conn:
         with conn.cursor() as cur:
-            for entry in moisture_data:
-                cur.execute(
-                    """
-                    INSERT INTO vv_data (date, vv_dB, description)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (date) DO UPDATE 
-                    SET vv_dB = EXCLUDED.vv_dB,
-                        description = EXCLUDED.description
-                """,
-                    (entry["date"], entry["vv_dB"], entry["description"]),
-                )
+            execute_values(
+                cur,
+                """
+                INSERT INTO vv_data (date, vv_dB, description)
+                VALUES %s
+                ON CONFLICT (date) DO UPDATE
+                SET vv_dB = EXCLUDED.vv_dB,
+                    description = EXCLUDED.description
+            """,
+                rows,
+                page_size=500,
+            )
         conn.commit()
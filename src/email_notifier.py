@@ -8,6 +8,10 @@ Environment Variables:
     SMTP_PASS (str): SMTP password.
     EMAIL_FROM (str): Sender email address.
     EMAIL_TO (str): Recipient email address.
+Classes:
+    SMTPPool:
+        Holds a single lazily-opened, authenticated SMTP connection that is reused across sends
+        and closed at process exit.
 Functions:
     send_email_notification (date_str, csv_path):
         Sends an email notification for the specified date, with an optional CSV attachment.
@@ -16,12 +20,13 @@ Author: Younes MRABTI
 """
 
 import os
+import atexit
 import smtplib
+import threading
 
+from string import Template
 from email.message import EmailMessage
 from email.utils import formatdate
-from email.mime.base import MIMEBase
-from email import encoders
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,6 +38,117 @@ smtp_pass = os.getenv("SMTP_PASS")
 email_from = os.getenv("EMAIL_FROM")
 email_to = os.getenv("EMAIL_TO")
 
+# Message bodies only vary by date; parse the templates once at import
+_SUBJECT_TMPL = Template("🛰️ SMAP Soil Moisture Data - $date_str")
+_TEXT_TMPL = Template("New SMAP soil moisture data for $date_str is now available. See attached CSV.")
+_HTML_TMPL = Template(
+    """
+    <html>
+      <body style="font-family: sans-serif; background-color: #f4f4f4; padding: 20px;">
+        <div style="background: white; padding: 20px; border-radius: 10px; max-width: 600px; margin: auto;">
+          <h2 style="color: #2e6da4;">🌱 SMAP Soil Moisture Report</h2>
+          <p>📅 <strong>Date:</strong> $date_str</p>
+          <p>A new SMAP soil moisture image has been exported and is available on Google Drive.</p>
+          <p>The CSV report is attached.</p>
+          <hr>
+          <p style="font-size: 12px; color: #888;">This is an automated message from your soil moisture monitoring system.</p>
+        </div>
+      </body>
+    </html>
+    """
+)
+
+
+class SMTPPool:
+    """
+    Keeps one authenticated SMTP connection open for the lifetime of the process,
+    so that K notifications pay for a single TCP + STARTTLS + AUTH handshake instead of K.
+
+    The connection is opened on first use, checked with `NOOP` before each reuse and
+    transparently re-established if the server has dropped it.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._server = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """
+        Returns the process-wide pool, creating it (and registering its `close` at exit) on first call.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    def _connect(self):
+        server = smtplib.SMTP(smtp_host, smtp_port)
+        try:
+            server.starttls()
+            server.login(smtp_user, smtp_pass)
+        except (smtplib.SMTPException, OSError):
+            server.close()
+            raise
+        return server
+
+    def _discard(self):
+        """
+        Closes the current connection without raising, whatever state its socket is in.
+        """
+        if self._server is None:
+            return
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        self._server = None
+
+    def _connection(self):
+        if self._server is not None:
+            try:
+                self._server.noop()
+                return self._server
+            except (smtplib.SMTPException, OSError):
+                # Dropped, timed out (e.g. 421) or reset while idle: reconnect
+                self._discard()
+        self._server = self._connect()
+        return self._server
+
+    def send(self, msg):
+        """
+        Sends an already-built message over the pooled connection, reconnecting once if it was dropped.
+
+        Args:
+            msg (email.message.EmailMessage): The message to send.
+        Raises:
+            smtplib.SMTPException: If sending the email fails.
+            OSError: If the SMTP server cannot be reached.
+        """
+        with self._lock:
+            try:
+                self._connection().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._discard()
+                self._connection().send_message(msg)
+
+    def close(self):
+        """
+        Closes the pooled connection, if any. Safe to call more than once.
+        """
+        with self._lock:
+            if self._server is None:
+                return
+            try:
+                self._server.quit()
+                self._server = None
+            except (smtplib.SMTPException, OSError):
+                self._discard()
+
 
 def send_email_notification(date_str, csv_path):
     """
@@ -50,26 +166,12 @@ def send_email_notification(date_str, csv_path):
         date_str (str): The date string to include in the email subject and body.
         csv_path (str, optional): Path to the CSV file to attach.
         If None or file does not exist, no attachment is sent.
-    Raises:
-        smtplib.SMTPException: If sending the email fails.
-    """
-    subject = f"🛰️ SMAP Soil Moisture Data - {date_str}"
-    text_body = f"New SMAP soil moisture data for {date_str} is now available. See attached CSV."
-
-    html_body = f"""
-    <html>
-      <body style="font-family: sans-serif; background-color: #f4f4f4; padding: 20px;">
-        <div style="background: white; padding: 20px; border-radius: 10px; max-width: 600px; margin: auto;">
-          <h2 style="color: #2e6da4;">🌱 SMAP Soil Moisture Report</h2>
-          <p>📅 <strong>Date:</strong> {date_str}</p>
-          <p>A new SMAP soil moisture image has been exported and is available on Google Drive.</p>
-          <p>The CSV report is attached.</p>
-          <hr>
-          <p style="font-size: 12px; color: #888;">This is an automated message from your soil moisture monitoring system.</p>
-        </div>
-      </body>
-    </html>
+    The message is sent over the shared `SMTPPool` connection; SMTP and connection errors are
+    reported on the console rather than raised.
     """
+    subject = _SUBJECT_TMPL.substitute(date_str=date_str)
+    text_body = _TEXT_TMPL.substitute(date_str=date_str)
+    html_body = _HTML_TMPL.substitute(date_str=date_str)
 
     msg = EmailMessage()
     msg["From"] = email_from
@@ -82,20 +184,16 @@ def send_email_notification(date_str, csv_path):
     # Attach CSV if it exists
     if csv_path and os.path.exists(csv_path):
         with open(csv_path, "rb") as f:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(f.read())
-            encoders.encode_base64(part)
-            part.add_header(
-                "Content-Disposition",
-                f'attachment; filename="{os.path.basename(csv_path)}"',
-            )
-            msg.attach(part)
+            data = f.read()
+        msg.add_attachment(
+            data,
+            maintype="text",
+            subtype="csv",
+            filename=os.path.basename(csv_path),
+        )
 
     try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
-            print("📧 Email with CSV report sent.")
-    except smtplib.SMTPException as e:
+        SMTPPool.get().send(msg)
+        print("📧 Email with CSV report sent.")
+    except (smtplib.SMTPException, OSError) as e:
         print(f"❌ Email send failed: {e}")
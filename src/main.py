@@ -3,49 +3,54 @@ Main entry point for the Soil Moisture Fetcher.
 
 This script automates the process of fetching daily NASA SMAP soil moisture data
 for a specified Zone of Interest (ZOI) using Google Earth Engine (GEE). It computes
-the mean soil moisture for the ZOI, exports clipped GeoTIFF images to Google Drive,
-saves daily statistics as CSV files, and sends notifications via webhook and/or email.
+the mean soil moisture for the ZOI, exports the images to Google Drive as one stacked GeoTIFF,
+saves the statistics of the whole run as a single CSV file, and sends notifications via webhook and/or email.
 
 Steps performed:
 1. Loads environment variables and credentials.
-2. Initializes the Google Earth Engine API.
-3. Defines the ZOI polygon.
+2. Stops early, before importing Earth Engine, when the last processed date already covers the window.
+3. Initializes the Google Earth Engine API (via `utils`) and defines the ZOI polygon.
 4. Fetches SMAP soil moisture images for the specified date range.
-5. For each image:
-   - Exports the clipped GeoTIFF to Google Drive.
-   - Computes and saves the mean soil moisture as a CSV file.
-   - Sends a notification with the CSV report via webhook and/or email.
+5. Exports all the images to Google Drive as a single GeoTIFF with one band per date.
+6. Computes the mean soil moisture of every image and saves them as one combined CSV file.
+7. Sends a single notification with the CSV report via webhook and/or email.
 
 Configuration is managed via a `.env` file.
 
 Author: Younes Mrabti
 """
 
-import os
 from datetime import datetime, timedelta, timezone
-import ee
-import pandas as pd
+from functools import lru_cache
 from db import get_last_processed_date, set_last_processed
-from utils import get_description, zoi
-from webhook_notifier import send_webhook_notification
-from email_notifier import send_email_notification
 
-ee.Initialize()
+
+@lru_cache(maxsize=1)
+def _deferred():
+    """
+    Imports and returns `ee`, `utils` (which initializes Earth Engine with the service account) and
+    `notify`, once per process.
+
+    They are only needed once `main` has found something to process, so a run with nothing new exits
+    without paying for those imports or the Earth Engine handshake.
+
+    Returns:
+        tuple: The `ee`, `utils` and `notify` modules.
+    """
+    import ee  # pylint: disable=import-outside-toplevel
+    import utils  # pylint: disable=import-outside-toplevel
+    import notify  # pylint: disable=import-outside-toplevel
+
+    return ee, utils, notify
+
 
 today = datetime.now(timezone.utc).date()
 yesterday = today - timedelta(days=5)
 START_DATE = yesterday.strftime("%Y-%m-%d")
 END_DATE = today.strftime("%Y-%m-%d")
 
-exported_data = []
-
-# Load SMAP dataset
-smap = (
-    ee.ImageCollection("NASA/SMAP/SPL4SMGP/007")
-    .filterBounds(zoi)
-    .filterDate(START_DATE, END_DATE)
-    .select("sm_surface")
-)
+COLLECTION_ID = "NASA/SMAP/SPL4SMGP/007"
+BAND = "sm_surface"
 
 
 # cls && .venv\Scripts\python.exe src/main.py
@@ -53,33 +58,40 @@ def main():
     """
     Main function to aggregate and print the array of start times from the SMAP dataset.
 
-    This function retrieves the 'system:time_start' property from the SMAP dataset using the
-    aggregate_array method, converts it to a Python list with getInfo(), and prints the resulting dates.
+    This function narrows the dataset to the images dated after the last processed date (returning without
+    any Earth Engine call when the date window is already covered), retrieves their 'system:time_start' and
+    'system:index' properties in a single, disk-cached getInfo() call, and exports them.
 
     Note:
-        The export functionality (run_export) is currently commented out.
+        When new images are found, `run_export` computes their means, starts the stacked GeoTIFF export
+        and sends the notifications.
     """
-    dates = smap.aggregate_array("system:time_start").getInfo()
-
     last = get_last_processed_date()
 
-    # Convert timestamps to datetime objects
-    image_dates = [datetime.fromtimestamp(ts / 1000, tz=timezone.utc) for ts in dates]
+    # Only ask Earth Engine for images dated after the last processed date
+    start = max(yesterday, last + timedelta(days=1)) if last else yesterday
+    if start >= today:
+        print("✅ No new dates to process.")
+        return
+    ee, utils, _ = _deferred()
+
+    # Load SMAP dataset
+    start_str = start.strftime("%Y-%m-%d")
+    updated_smap = (
+        ee.ImageCollection(COLLECTION_ID)
+        .filterBounds(utils.zoi)
+        .filterDate(start_str, END_DATE)
+        .select(BAND)
+    )
 
-    # Filter images that are after the last processed date (or all if None)
-    if last:
-        new_dates = [dt for dt in image_dates if dt.date() > last]
-    else:
-        new_dates = image_dates
+    # One round trip (or none, when cached) for all the collection metadata needed client-side
+    info = utils.fetch_collection_info(updated_smap)
+
+    # Convert timestamps to datetime objects
+    new_dates = [datetime.fromtimestamp(ts / 1000, tz=timezone.utc) for ts in info["times"]]
 
     # ✅ Example log
     if new_dates:
-        updated_smap = (
-            ee.ImageCollection("NASA/SMAP/SPL4SMGP/007")
-            .filterBounds(zoi)
-            .filterDate(new_dates[0], new_dates[-1])
-            .select("sm_surface")
-        )
         print(f"🆕 {len(new_dates)} new dates to process.")
 
         if len(new_dates) == 1:
@@ -92,118 +104,142 @@ def main():
         print("✅ No new dates to process.")
 
 
-def extract_data(img):
+def extract_sm_mean(img):
+    """
+    Builds a server-side feature holding the date and the mean soil moisture of an image over the ZOI.
+
+    Mapped over the collection so that every reduction is evaluated by Earth Engine in a
+    single `getInfo()` call instead of one round trip per image.
+
+    Args:
+        img (ee.Image): The SMAP image to reduce.
+
+    Returns:
+        ee.Feature: A geometry-less feature with properties 'date' (formatted as 'YYYY-MM-dd')
+        and 'sm' (mean "sm_surface" value over the ZOI).
+    """
+    ee, utils, _ = _deferred()
+
+    stats = img.reduceRegion(
+        reducer=ee.Reducer.mean(),
+        geometry=utils.zoi,
+        scale=10000,
+        maxPixels=1e9,
+    )
+    return ee.Feature(
+        None,
+        {
+            "date": img.date().format("YYYY-MM-dd"),
+            "sm": stats.get(BAND),
+        },
+    )
+
+
+def export_stack(smap_to_use, first_date, last_date):
     """
-    Exports a given Earth Engine image to Google Drive,
-    computes the mean soil moisture for a specified zone of interest (ZOI),
-    saves the result as a local CSV file, and sends a webhook notification.
+    Exports every image of the collection to Google Drive as a single multi-band GeoTIFF.
     Args:
-        img (ee.Image): The Earth Engine image to export and analyze.
+        smap_to_use (ee.ImageCollection): The SMAP images to export.
+        first_date (str): Date of the first image ('YYYY-MM-dd'), used in the file name.
+        last_date (str): Date of the last image ('YYYY-MM-dd'), used in the file name.
     Side Effects:
-        - Starts an Earth Engine export task to Google Drive for the clipped image.
+        - Starts one Earth Engine export task to Google Drive, cropped to the ZOI bounds.
         - Prints status messages to the console.
-        - Computes the mean soil moisture value ("sm_surface") for
-        the ZOI and saves it as a CSV file locally.
-        - Sends a webhook notification with the export date.
-    Environment Variables:
-        GDRIVE_FOLDER (str, optional): The Google Drive
-        folder to export the image to. Defaults to "GEE_Soil_Moisture".
     Notes:
-        - Requires the global variable `zoi` (zone of interest) to be defined.
-        - Assumes the presence of the `send_webhook_notification` function.
-        - Optionally, an email notification can be sent by uncommenting the relevant line.
+        - `toBands()` names each band '<system:index>_sm_surface', so readers can split the stack per date.
+        - Uses the `zoi` (zone of interest) defined in `utils`.
     """
-    date_str = img.date().format("YYYY-MM-dd").getInfo()
-    filename = f"smap_soil_moisture_{date_str}"
+    ee, utils, _ = _deferred()
 
+    filename = f"smap_soil_moisture_{first_date}_{last_date}"
+
+    # `region` already crops the export; a 10 km SMAP pixel is larger than the ZOI, so no clip is needed
     task = ee.batch.Export.image.toDrive(
-        image=img.clip(zoi),
+        image=smap_to_use.toBands(),
         description=filename,
         folder="GEE_Soil_Moisture_Moulouya",
         fileNamePrefix=filename,
         scale=10000,
-        region=zoi,
+        region=utils.zoi,
         maxPixels=1e13,
         fileFormat="GeoTIFF",
     )
     task.start()
-    print(f"🛰️ Export started for {date_str}")
-
-    # 1. Extract soil moisture mean for your ZOI on this image
-    mean_dict = img.reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=zoi,
-        scale=10000,
-        maxPixels=1e9,
-    ).getInfo()
-
-    vv = mean_dict.get("sm_surface", None)
-    exported_data.append(
-        {
-            "date": date_str,
-            "vv_dB": vv,
-            "description": get_description(vv),
-        }
-    )
+    print(f"🛰️ Export started for {first_date} → {last_date}")
 
 
 # Run export
 def run_export(smap_to_use, times):
     """
     Processes and exports soil moisture images from the SMAP dataset within a specified date range.
-    This function retrieves a list of images from the `smap_to_use` object, checks if any images are available,
-    and iterates through each image to extract data using the `extract_data` function. If no images are found,
-    a warning message is printed. If an error occurs while processing an image, an error message is displayed
-    with the corresponding index and exception details.
+    1. The per-image dates and ZOI means are computed server-side by mapping `extract_sm_mean` over
+       `smap_to_use` and fetched with a single `getInfo()`; they become the report rows.
+    2. The whole collection is exported with `export_stack` as one stacked GeoTIFF (one band per date),
+       so a run submits a single Drive task instead of one per image.
+    3. The CSV is written and notifications are sent by `bulk_notify_and_hook`.
+    If no images are found, a warning message is printed. If the export fails to start, an error
+    message is displayed with the exception details.
     Raises:
-        ee.EEException: If an error occurs during image processing.
+        ee.EEException: If the batched reduction fails.
     """
+    ee, utils, _ = _deferred()
 
     # Run export
-    images = smap_to_use.toList(smap_to_use.size())
-    image_count = smap_to_use.size().getInfo()
+    results = smap_to_use.map(extract_sm_mean).getInfo()["features"]
+    image_count = len(results)
     if image_count == 0:
         print("⚠️ No images found for the specified date range.")
-    else:
-        for i in range(image_count):
-            try:
-                image = ee.Image(images.get(i))
-                extract_data(image)
-            except ee.EEException as e:
-                print(f"❌ Failed to process image at index {i}: {e}")
+        bulk_notify_and_hook([], times)
+        return
+
+    rows = sorted(
+        (
+            {
+                "date": props["date"],
+                "vv_dB": props.get("sm"),
+                "description": utils.get_description(props.get("sm")),
+            }
+            for props in (feature["properties"] for feature in results)
+        ),
+        key=lambda row: row["date"],
+    )
 
-    bulk_notify_and_hook(times)
+    try:
+        export_stack(smap_to_use, rows[0]["date"], rows[-1]["date"])
+    except ee.EEException as e:
+        print(f"❌ Failed to export images: {e}")
+    bulk_notify_and_hook(rows, times)
 
 
-def bulk_notify_and_hook(times):
+def bulk_notify_and_hook(rows, times):
     """
     Processes and exports collected soil moisture data, then sends notifications.
-    If `exported_data` is available, this function:
-    - Converts the data to a pandas DataFrame.
-    - Saves the DataFrame as a CSV file in the 'exports' directory, named with the current `START_DATE` and `END_DATE`.
+    If `rows` is not empty, this function:
+    - Saves the rows as a CSV file in the 'exports' directory, named with the current `START_DATE` and `END_DATE`.
     - Prints the path to the saved CSV file.
-    - Sends a webhook notification with the list of dates in the exported data.
-    - Sends an email notification with the CSV file attached.
+    - Sends a webhook notification with the list of dates in the exported data, and an email notification
+      with the CSV file attached, on a background thread pool so the caller is not blocked on them.
     If no data is available, prints a warning message.
+    Args:
+        rows (list[dict]): The soil moisture rows of the run ('date', 'vv_dB', 'description').
+        times (str): The date range label used in the email subject.
     Assumes the existence of the following global variables and functions:
-    - `exported_data`: List of dictionaries containing soil moisture data.
     - `START_DATE`, `END_DATE`: Strings representing the date range of the data.
-    - `send_webhook_notification(dates: exported_data)`: Function to send a webhook notification.
-    - `send_email_notification (mode: str, file_path: str)`: Function to send an email notification.
+    - `notify(rows, csv_path, tag)`: Function sending the webhook and email notifications.
     """
-    if exported_data:
-        df = pd.DataFrame(exported_data)
-        os.makedirs("exports", exist_ok=True)
-        combined_csv_path = f"exports/soil_moisture_{START_DATE}_{END_DATE}.csv"
-        df.to_csv(combined_csv_path, index=False)
+    _, utils, notify = _deferred()
+
+    if rows:
+        combined_csv_path = utils.EXPORTS_DIR / f"soil_moisture_{START_DATE}_{END_DATE}.csv"
+        utils.write_csv(combined_csv_path, rows)
         print(f"💾 Combined CSV saved: {combined_csv_path}")
 
-        # ✅ One-time notification
-        send_webhook_notification(exported_data)
-        send_email_notification(times, combined_csv_path)
-        set_last_processed(exported_data)
+        # ✅ One-time notification, sent in the background so the run does not wait on SMTP/HTTP
+        notify.notify(rows, combined_csv_path, times)
+        set_last_processed(rows)
     else:
         print("⚠️ No data to export or notify.")
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,16 @@ Main entry point for the Soil Moisture Fetcher.
 
 This script automates the process of fetching daily NASA SMAP soil moisture data
 for a specified Zone of Interest (ZOI) using Google Earth Engine (GEE). It computes
-the mean soil moisture for the ZOI, exports clipped GeoTIFF images to Google Drive,
-saves daily statistics as CSV files, and sends notifications via webhook and/or email.
+the mean soil moisture for the ZOI, saves the statistics of the whole run as a single CSV file,
+and sends notifications via webhook and/or email.
 
 Steps performed:
 1. Loads environment variables and credentials.
-2. Initializes the Google Earth Engine API.
+2. Initializes the Google Earth Engine API (via `utils`).
 3. Defines the ZOI polygon.
 4. Fetches SMAP soil moisture images for the specified date range.
-5. For each image:
-   - Exports the clipped GeoTIFF to Google Drive.
-   - Computes and saves the mean soil moisture as a CSV file.
-   - Sends a notification with the CSV report via webhook and/or email.
+5. Computes the mean soil moisture of every image and saves them as one combined CSV file.
+6. Sends a single notification with the CSV report via webhook and/or email.
 
 Configuration is managed via a `.env` file.
 
@@ -23,27 +21,22 @@ Author: Younes Mrabti
 
 import os
 import time
+import shelve
+import sys
 import logging
 from datetime import datetime, timedelta, timezone
 import ee
-import pandas as pd
+import psycopg2
 
 # from db import get_last_processed_date
 from db import create_table_if_missing, get_last_processed_date, set_last_processed
-from utils import get_sentinel_description, zoi
-from webhook_notifier import send_webhook_notification
-from email_notifier import send_email_notification
+from utils import CACHE_DIR, EXPORTS_DIR, ZOI_HASH, fetch_collection_info, get_sentinel_description, write_csv, zoi
+from notify import notify
 
 
-create_table_if_missing()
-
-today = datetime.now(timezone.utc).date()
-yesterday = today - timedelta(days=7)
-
-START_DATE = yesterday.strftime("%Y-%m-%d")
-END_DATE = today.strftime("%Y-%m-%d")
-
-exported_data = []
+# Days of imagery fetched back from the run date; the scheduler loop keeps the process alive for
+# weeks, so `main` computes the window from the current date on every run
+LOOKBACK_DAYS = 7
 
 # Visualization parameters for VV (dB)
 vis_params = {
@@ -52,15 +45,21 @@ vis_params = {
     "palette": ["0000FF", "00FFFF", "00FF00", "FFFF00", "FF0000"],  # Blue to Red
 }
 
-# Load SMAP dataset
+COLLECTION_ID = "COPERNICUS/S1_GRD"
+BAND = "VV"
+SCALE = 10
+
+# On-disk cache of per-scene reductions, keyed by (image id, scale, ZOI hash)
+CACHE_PATH = os.path.join(CACHE_DIR, "vv_means")
+
+# Sentinel-1 scenes over the ZOI; the date filter is applied per run in `main`
 smap = (
-    ee.ImageCollection("COPERNICUS/S1_GRD")
+    ee.ImageCollection(COLLECTION_ID)
     .filterBounds(zoi)
-    .filterDate(START_DATE, END_DATE)
     .filter(ee.Filter.eq("instrumentMode", "IW"))
     .filter(ee.Filter.eq("orbitProperties_pass", "ASCENDING"))
     .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VV"))
-    .select("VV")
+    .select(BAND)
 )
 
 
@@ -69,37 +68,35 @@ def main():
     """
     Main function to aggregate and print the array of start times from the SMAP dataset.
 
-    This function retrieves the 'system:time_start' property from the SMAP dataset using the
-    aggregate_array method, converts it to a Python list with getInfo(), and prints the resulting dates.
+    This function narrows the dataset to the images dated after the last processed date (returning without
+    any Earth Engine call when the date window is already covered), retrieves their 'system:time_start' and
+    'system:index' properties in a single, disk-cached getInfo() call, and exports them.
 
     Note:
-        The export functionality (run_export) is currently commented out.
+        The export goes through `export_table`, which writes the CSV report of the VV means, notifies and
+        records the rows.
     """
-    dates = smap.aggregate_array("system:time_start").getInfo()
-
+    today = datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=LOOKBACK_DAYS)
+    end_str = today.strftime("%Y-%m-%d")
     last = get_last_processed_date()
 
-    # Convert timestamps to datetime objects
-    image_dates = [datetime.fromtimestamp(ts / 1000, tz=timezone.utc) for ts in dates]
+    # Only ask Earth Engine for images dated after the last processed date
+    start = max(yesterday, last + timedelta(days=1)) if last else yesterday
+    if start >= today:
+        logging.info("✅ No new dates to process.")
+        return
+    start_str = start.strftime("%Y-%m-%d")
+    updated_smap = smap.filterDate(start_str, end_str)
 
-    # Filter images that are after the last processed date (or all if None)
-    if last:
-        new_dates = [dt for dt in image_dates if dt.date() > last]
-    else:
-        new_dates = image_dates
+    # One round trip (or none, when cached) for all the collection metadata needed client-side
+    info = fetch_collection_info(updated_smap)
+
+    # Convert timestamps to datetime objects
+    new_dates = [datetime.fromtimestamp(ts / 1000, tz=timezone.utc) for ts in info["times"]]
 
     # ✅ Example log
     if new_dates:
-        updated_smap = (
-            ee.ImageCollection("COPERNICUS/S1_GRD")
-            .filterBounds(zoi)
-            .filterDate(new_dates[0])
-            .filter(ee.Filter.eq("instrumentMode", "IW"))
-            .filter(ee.Filter.eq("orbitProperties_pass", "ASCENDING"))
-            .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VV"))
-            .select("VV")
-        )
-
         logging.info("🆕  %d new dates to process.", len(new_dates))
 
         if len(new_dates) == 1:
@@ -107,126 +104,88 @@ def main():
         else:
             ts = f"{new_dates[0].strftime("%Y-%m-%d %H_%M")} → {new_dates[-1].strftime("%Y-%m-%d %H_%M")}"
         logging.info("From: %s", ts)
-        export_table(updated_smap, ts)
+        export_table(updated_smap, ts, info["ids"])
     else:
         logging.info("✅ No new dates to process.")
 
 
-def extract_data(img):
-    """
-    Exports a given Earth Engine image to Google Drive,
-    computes the mean soil moisture for a specified zone of interest (ZOI),
-    saves the result as a local CSV file, and sends a webhook notification.
-    Args:
-        img (ee.Image): The Earth Engine image to export and analyze.
-    Side Effects:
-        - Starts an Earth Engine export task to Google Drive for the clipped image.
-        - Prints status messages to the console.
-        - Computes the mean soil moisture value ("sm_surface") for
-        the ZOI and saves it as a CSV file locally.
-        - Sends a webhook notification with the export date.
-    Environment Variables:
-        GDRIVE_FOLDER (str, optional): The Google Drive
-        folder to export the image to. Defaults to "GEE_Soil_Moisture".
-    Notes:
-        - Requires the global variable `zoi` (zone of interest) to be defined.
-        - Assumes the presence of the `send_webhook_notification` function.
-        - Optionally, an email notification can be sent by uncommenting the relevant line.
+def reduce_vv_means(smap_to_use, image_ids):
     """
-    date_str = img.date().format("YYYY-MM-dd").getInfo()
-    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    filename = f"{now_str}/soil_moisture_{date_str}"
-
-    # vv_rgb = img.clip(zoi).visualize(**vis_params)
-    task = ee.batch.Export.image.toDrive(
-        image=img.clip(zoi),
-        description=f"soil_moisture_{date_str}",
-        folder="GEE_Soil_Moisture_Moulouya",
-        fileNamePrefix=filename,
-        region=zoi,
-        scale=10,
-        maxPixels=1e9,
-        fileFormat="GeoTIFF",
-    )
-    task.start()
-    while task.active():
-        logging.info("Task is running...")
-        time.sleep(10)
-
-    logging.info("Task state: %s", task.status()["state"])
-    logging.info("🛰️ Export started for %s", date_str)
-
-    # 1. Extract soil moisture mean for your ZOI on this image
-    mean_dict = img.reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=zoi,
-        scale=10,
-        maxPixels=1e9,
-    ).getInfo()
+    Returns the mean VV backscatter of the given images over the ZOI, reusing results cached on disk.
 
-    vv = mean_dict.get("VV", None)
-    exported_data.append(
-        {
-            "date": date_str,
-            "vv_dB": vv,
-            "description": get_sentinel_description(vv),
-        }
-    )
+    Reductions are deterministic for a given scene, scale and geometry, so only the images missing
+    from the cache at `CACHE_PATH` are reduced by Earth Engine, and their results are written back.
+    Re-runs over overlapping date windows therefore skip the scenes already seen.
 
-
-def extract_vv_mean(img):
-    """
-    Extracts the mean VV (vertical transmit, vertical receive) backscatter value from a given Earth Engine image over a specified geometry.
+    The missing images are stacked with `toBands()` and reduced by a single `reduceRegion`, which
+    yields one '<system:index>_VV' mean per scene; it is fetched in the same `getInfo()` as the
+    scene ids and timestamps.
 
     Args:
-        img (ee.Image): The Earth Engine image from which to extract the mean VV value.
+        smap_to_use (ee.ImageCollection): The collection containing the images.
+        image_ids (list[str]): The 'system:index' of the images to reduce.
 
     Returns:
-        ee.Feature: An Earth Engine Feature containing the date of the image and the mean VV value over the specified geometry.
-
-    Note:
-        - The function assumes that the variables `ee` (Earth Engine API) and `zoi` (zone of interest geometry) are defined in the global scope.
-        - The returned feature has properties 'date' (formatted as 'YYYY-MM-dd') and 'vv' (mean VV value).
+        list[dict]: The properties 'id', 'date' (formatted as 'YYYY-MM-dd') and 'vv' (mean VV value,
+        None when the scene has no valid pixel over the ZOI) of each image, in `image_ids` order.
     """
-    stats = img.reduceRegion(
-        reducer=ee.Reducer.mean(), geometry=zoi, scale=10, maxPixels=1e9
-    )
-    return ee.Feature(
-        None, {"date": img.date().format("YYYY-MM-dd"), "vv": stats.get("VV")}
-    )
-
-
-def export_table(smap_to_use, timestamps):
+    keys = {image_id: f"{image_id}|{SCALE}|{ZOI_HASH}" for image_id in image_ids}
+
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    with shelve.open(CACHE_PATH) as cache:
+        properties = {image_id: cache[key] for image_id, key in keys.items() if key in cache}
+        missing = [image_id for image_id in image_ids if image_id not in properties]
+        if missing:
+            logging.info("🧮 Reducing %d uncached scene(s).", len(missing))
+            scenes = smap_to_use.filter(ee.Filter.inList("system:index", missing))
+            info = ee.Dictionary(
+                {
+                    "ids": scenes.aggregate_array("system:index"),
+                    "times": scenes.aggregate_array("system:time_start"),
+                    # tileScale splits the stacked reduction into smaller tiles so it stays
+                    # within Earth Engine's per-tile memory limit as the number of bands grows
+                    "means": scenes.toBands().reduceRegion(
+                        reducer=ee.Reducer.mean(), geometry=zoi, scale=SCALE, maxPixels=1e9, tileScale=4
+                    ),
+                }
+            ).getInfo()
+            for image_id, time_start in zip(info["ids"], info["times"]):
+                props = {
+                    "id": image_id,
+                    "date": datetime.fromtimestamp(time_start / 1000, tz=timezone.utc).strftime("%Y-%m-%d"),
+                    "vv": info["means"].get(f"{image_id}_{BAND}"),
+                }
+                cache[keys[image_id]] = props
+                properties[image_id] = props
+
+    return [properties[image_id] for image_id in image_ids if image_id in properties]
+
+
+def export_table(smap_to_use, timestamps, image_ids):
     """
     Exports a table of mean VV (vertical transmit and receive) backscatter values from a collection of features.
-    This function processes a collection of features by extracting the mean VV value for each feature, filtering out any features with null VV values, and then converting the results into a pandas DataFrame.
-    The resulting DataFrame contains columns for the date and the corresponding VV value in decibels (dB). The 'date' column is converted to pandas datetime objects for easier manipulation and analysis.
-    The DataFrame is then printed to the console.
+    This function extracts the mean VV value of each image in `image_ids` (through the `reduce_vv_means` cache), filters out any features with null VV values, and then writes the rows to a CSV file.
+    The rows contain the date (kept as 'YYYY-MM-dd' strings so they stay JSON-serializable for the webhook),
+    the corresponding VV value in decibels (dB) and its description.
     Returns:
         None
     """
-    features = smap_to_use.map(extract_vv_mean).filter(ee.Filter.notNull(["vv"]))
-    results = features.getInfo()["features"]
-    df = pd.DataFrame(
-        [
-            {
-                "date": f["properties"]["date"],
-                "vv_dB": f["properties"]["vv"],
-                "description": get_sentinel_description(f["properties"]["vv"]),
-            }
-            for f in results
-        ]
-    )
+    results = [props for props in reduce_vv_means(smap_to_use, image_ids) if props.get("vv") is not None]
+    dataset = [
+        {
+            "date": props["date"],
+            "vv_dB": props["vv"],
+            "description": get_sentinel_description(props["vv"]),
+        }
+        for props in results
+    ]
 
-    folder_path = os.path.join("exports", timestamps)
-    os.makedirs(folder_path, exist_ok=True)
-    combined_csv_path = f"exports/{timestamps}/soil_moisture.csv"
-    df.to_csv(combined_csv_path, index=False)
+    combined_csv_path = EXPORTS_DIR / timestamps / "soil_moisture.csv"
+    write_csv(combined_csv_path, dataset)
     logging.info("💾 Combined CSV saved: %s", combined_csv_path)
 
-    dataset = df.to_dict(orient="records")
-    send_webhook_notification(dataset)
-    send_email_notification(timestamps, combined_csv_path)
+    # Sent in the background so the run does not wait on SMTP/HTTP
+    notify(dataset, combined_csv_path, timestamps)
     set_last_processed(dataset)
 
 
@@ -267,72 +226,23 @@ def export_geotiff(updated_smap):
     task.start()
 
 
-# Run export
-def run_export(updated_smap, timestamps):
-    """
-    Processes and exports soil moisture images from the SMAP dataset within a specified date range.
-    This function retrieves a list of images from the global `updated_smap` object, checks if any images are available,
-    and iterates through each image to extract data using the `extract_data` function. If no images are found,
-    a warning message is printed. If an error occurs while processing an image, an error message is displayed
-    with the corresponding index and exception details.
-    Raises:
-        ee.EEException: If an error occurs during image processing.
-    """
-    images = updated_smap.toList(updated_smap.size())
-    image_count = updated_smap.size().getInfo()
-
-    if image_count == 0:
-        logging.info("⚠️ No images found for the specified date range.")
-    else:
-        for i in range(image_count):
-            try:
-                image = ee.Image(images.get(i))
-                extract_data(image)
-            except ee.EEException as e:
-                logging.info("❌ Failed to process image at index %s: %s", i, e)
-    bulk_notify_and_hook(timestamps)
-
-
-def bulk_notify_and_hook(timestamps):
-    """
-    Processes and exports collected soil moisture data, then sends notifications.
-    If `exported_data` is available, this function:
-    - Converts the data to a pandas DataFrame.
-    - Saves the DataFrame as a CSV file in the 'exports' directory, named with the current `START_DATE` and `END_DATE`.
-    - Prints the path to the saved CSV file.
-    - Sends a webhook notification with the list of dates in the exported data.
-    - Sends an email notification with the CSV file attached.
-    If no data is available, prints a warning message.
-    Assumes the existence of the following global variables and functions:
-    - `exported_data`: List of dictionaries containing soil moisture data.
-    - `START_DATE`, `END_DATE`: Strings representing the date range of the data.
-    - `send_webhook_notification(dates: exported_data)`: Function to send a webhook notification.
-    - `send_email_notification (mode: str, file_path: str)`: Function to send an email notification.
-    """
-    if exported_data:
-        df = pd.DataFrame(exported_data)
-        os.makedirs("exports", exist_ok=True)
-        combined_csv_path = f"exports/soil_moisture_{START_DATE}_{END_DATE}.csv"
-        df.to_csv(combined_csv_path, index=False)
-        logging.info("💾 Combined CSV saved: %s", combined_csv_path)
-
-        # ✅ One-time notification
-        send_webhook_notification(exported_data)
-        send_email_notification(timestamps, combined_csv_path)
-        set_last_processed(exported_data)
-    else:
-        logging.info("⚠️ No data to export or notify.")
-
-
 # Run the script every 7 days
 INTERVAL_DAYS = 7
 INTERVAL_SECONDS = INTERVAL_DAYS * 24 * 60 * 60
 
 if __name__ == "__main__":
+    # `--once` runs a single pass and exits, for a systemd timer or cron job that owns the schedule;
+    # without it the script keeps its own weekly loop (the Docker service relies on this)
+    once = "--once" in sys.argv[1:]
+    create_table_if_missing()
     while True:
         try:
             main()
-        except (ee.EEException, OSError, ValueError) as e:
+        except (ee.EEException, psycopg2.Error, OSError, ValueError) as e:
             logging.info("❌ Error occurred: %s", e)
+            if once:
+                sys.exit(1)
+        if once:
+            break
         logging.info("⏳ Sleeping for %d days...\n", INTERVAL_DAYS)
         time.sleep(INTERVAL_SECONDS)
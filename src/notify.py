@@ -0,0 +1,52 @@
+"""
+This module dispatches the end-of-run notifications through a single entry point.
+Functions:
+    notify(rows, csv_path, tag):
+        Sends the webhook notification (with the report rows) and the email notification
+        (with the CSV report attached) concurrently, in the background.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from webhook_notifier import send_webhook_notification
+from email_notifier import send_email_notification
+
+# Shared by every run of the process; its worker threads are joined at interpreter exit,
+# so notifications still queued when the script ends are delivered before it quits
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notify")
+
+
+def _log_failure(future):
+    """
+    Logs the exception of a finished notification, if any; the notifiers only handle their own
+    SMTP/HTTP errors, and nothing else waits on these futures.
+    """
+    exc = future.exception()
+    if exc is not None:
+        logging.error("❌ Notification failed: %s", exc, exc_info=exc)
+
+
+def notify(rows, csv_path, tag):
+    """
+    Sends the webhook and email notifications of a run without blocking the caller.
+
+    The SMTP handshake and the webhook POST are submitted together, so they overlap with each
+    other and with whatever the caller does next. Any exception a notifier lets through is logged
+    when its future completes.
+
+    Args:
+        rows (list[dict]): The report rows, sent as the webhook payload.
+        csv_path (str): Path of the CSV report attached to the email.
+        tag (str): The date range label used in the email subject.
+
+    Returns:
+        list[concurrent.futures.Future]: The futures of the two notifications, for callers that
+        want to wait on them.
+    """
+    futures = [
+        _EXECUTOR.submit(send_webhook_notification, rows),
+        _EXECUTOR.submit(send_email_notification, tag, csv_path),
+    ]
+    for future in futures:
+        future.add_done_callback(_log_failure)
+    return futures
@@ -14,12 +14,11 @@ Constants:
 Logging:
 - Logs initialization, task start, progress, and final status.
 Dependencies:
-- os, time, pprint, logging, json, ee (Earth Engine Python API)
+- os, time, logging, json, ee (Earth Engine Python API)
 """
 
 import os
 import time
-import pprint
 import logging
 from datetime import datetime, timedelta, timezone
 from google.oauth2 import service_account
@@ -37,9 +36,11 @@ SERVICE_ACCOUNT_PATH = os.path.join(
 )
 FOLDER_NAME = "GEE_Soil_Moisture_Moulouya"
 
-logging.basicConfig(level=logging.INFO)
 
-with open(SERVICE_ACCOUNT_PATH, "r", encoding="utf-8") as f:
+def main():
+    """Exports the test Sentinel-1 mosaic to Google Drive and waits for the task to finish."""
+    logging.basicConfig(level=logging.INFO)
+
     credentials = service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT_PATH
     ).with_scopes(
@@ -49,60 +50,70 @@ with open(SERVICE_ACCOUNT_PATH, "r", encoding="utf-8") as f:
         ]
     )
 
-print(credentials.scopes)
-ee.Initialize(credentials)
-logging.info("✅ Earth Engine initialisé.")
+    logging.debug("Scopes : %s", credentials.scopes)
+    ee.Initialize(credentials)
+    logging.info("✅ Earth Engine initialisé.")
 
-# Petite région (polygon random)
-region = ee.Geometry.Polygon(
-    [
+    # Petite région (polygon random)
+    region = ee.Geometry.Polygon(
         [
-            [-2.3481773965156094, 35.10994069768071],
-            [-2.3456620930114127, 35.1057921166766],
-            [-2.3395766814241767, 35.10280500753562],
-            [-2.331259952255124, 35.10466366608924],
-            [-2.327568135891795, 35.11004026111742],
-            [-2.326026498289366, 35.1151510164202],
-            [-2.3265944700380317, 35.120560103022925],
-            [-2.337020808557469, 35.12357974361997],
-            [-2.3424976789862626, 35.12304882591104],
-            [-2.3440393165879527, 35.11992961448671],
-            [-2.344485580152309, 35.11820404187584],
-            [-2.343674191940522, 35.115781541852286],
-            [-2.3447289966161122, 35.113292596948455],
-            [-2.3481773965156094, 35.10994069768071],
+            [
+                [-2.3481773965156094, 35.10994069768071],
+                [-2.3456620930114127, 35.1057921166766],
+                [-2.3395766814241767, 35.10280500753562],
+                [-2.331259952255124, 35.10466366608924],
+                [-2.327568135891795, 35.11004026111742],
+                [-2.326026498289366, 35.1151510164202],
+                [-2.3265944700380317, 35.120560103022925],
+                [-2.337020808557469, 35.12357974361997],
+                [-2.3424976789862626, 35.12304882591104],
+                [-2.3440393165879527, 35.11992961448671],
+                [-2.344485580152309, 35.11820404187584],
+                [-2.343674191940522, 35.115781541852286],
+                [-2.3447289966161122, 35.113292596948455],
+                [-2.3481773965156094, 35.10994069768071],
+            ]
         ]
-    ]
-)
-# Image de test
-image = (
-    ee.ImageCollection("COPERNICUS/S1_GRD")
-    .filterBounds(region)
-    .filterDate(START_DATE, END_DATE)
-    .filter(ee.Filter.eq("instrumentMode", "IW"))
-    .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VV"))
-    .select("VV")
-    .mosaic()
-    .clip(region)
-)
+    )
+    # Image de test
+    image = (
+        ee.ImageCollection("COPERNICUS/S1_GRD")
+        .filterBounds(region)
+        .filterDate(START_DATE, END_DATE)
+        .filter(ee.Filter.eq("instrumentMode", "IW"))
+        .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VV"))
+        .select("VV")
+        .mosaic()
+        .clip(region)
+        # dB × 100 en int16 : 0,01 dB de précision, GeoTIFF deux fois plus léger qu'en float32
+        .multiply(100)
+        .toInt16()
+    )
 
-task = ee.batch.Export.image.toDrive(
-    image=image,
-    description="Export GeoTIFF",
-    folder=FOLDER_NAME,
-    fileNamePrefix=START_DATE,
-    region=region,
-    scale=10,
-    maxPixels=1e9,
-    fileFormat="GeoTIFF",
-    crs="EPSG:4326",
-)
-task.start()
-logging.info("📤 Tâche lancée.")
+    task = ee.batch.Export.image.toDrive(
+        image=image,
+        description="Export GeoTIFF",
+        folder=FOLDER_NAME,
+        fileNamePrefix=START_DATE,
+        region=region,
+        scale=10,
+        maxPixels=1e9,
+        fileFormat="GeoTIFF",
+        formatOptions={"cloudOptimized": True, "noData": -32768},
+        crs="EPSG:4326",
+    )
+    task.start()
+    logging.info("📤 Tâche lancée.")
+
+    # Backoff : réagit vite aux tâches courtes, interroge moins souvent les longues
+    delay = 0.5
+    while task.active():
+        logging.info("⏳ En cours...")
+        time.sleep(delay)
+        delay = min(delay * 1.5, 30.0)
+
+    logging.info("🎯 Statut final : %s", task.status())
 
-while task.active():
-    logging.info("⏳ En cours...")
-    time.sleep(10)
 
-logging.info("🎯 Statut final :")
-pprint.pprint(task.status())
+if __name__ == "__main__":
+    main()
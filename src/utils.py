@@ -18,24 +18,18 @@ Author: Younes MRABTI
 
 from datetime import datetime, timezone
 import os
+import csv
 import json
+import time
+import shelve
+import hashlib
+from functools import lru_cache
+from pathlib import Path
 from google.oauth2 import service_account
 import ee
 
 
 SERVICE_ACCOUNT_PATH = "/app/gee-service-account.json"
-# Vérifie d'abord que le fichier existe
-# Lecture + debug facultatif
-print(os.path.isfile(SERVICE_ACCOUNT_PATH))
-
-with open(SERVICE_ACCOUNT_PATH, "r", encoding="utf-8") as f:
-    data = json.load(f)
-    print("== Service Account Debug ==")
-    print(f"type: {data.get('type')}")
-    print(f"client_email: {data.get('client_email')}")
-    print(f"project_id: {data.get('project_id')}")
-    print(f"private_key_id: {data.get('private_key_id')[:8]}...")
-    print("===========================")
 
 # Créer des credentials Google Auth
 credentials = service_account.Credentials.from_service_account_file(
@@ -43,6 +37,8 @@ credentials = service_account.Credentials.from_service_account_file(
 )
 
 # Initialiser Earth Engine avec les credentials modernes
+# Endpoint standard : l'endpoint high-volume ne sert pas aux exports batch (Export.image.toDrive),
+# et les requêtes getInfo sont déjà regroupées en un seul appel par exécution
 ee.Initialize(credentials)
 
 # Zone of Interest
@@ -66,10 +62,17 @@ zoi = ee.Geometry.Polygon(
         ]
     ]
 )
-area_m2 = zoi.area().getInfo()
-print(f"Area: {area_m2 / 1e6:.2f} km²")
 
+# Local cache of Earth Engine results; entries are keyed on the ZOI so a new polygon never reuses them
+CACHE_DIR = "cache"
+ZOI_HASH = hashlib.sha1(zoi.toGeoJSONString().encode("utf-8")).hexdigest()
 
+# Directory of the CSV reports, and their columns
+EXPORTS_DIR = Path("exports")
+CSV_FIELDS = ("date", "vv_dB", "description")
+
+
+@lru_cache(maxsize=256)
 def get_description(vv_db):
     """
     Returns a textual description of soil moisture conditions based on the input VV dB value.
@@ -104,6 +107,7 @@ def get_description(vv_db):
         return "5 – Moist: Recently irrigated or after light rain"
 
 
+@lru_cache(maxsize=256)
 def get_sentinel_description(vv_db):
     """
     Returns a textual description of soil moisture conditions based on the input VV dB value.
@@ -146,21 +150,105 @@ def print_available_dates(smap):
     """
     Prints the range of available dates from the 'smap' dataset.
 
-    This function retrieves an array of timestamps from the 'smap' object's 'system:time_start' property,
-    converts the first and last timestamps to human-readable UTC date strings, and prints the range.
+    This function reduces the 'smap' object's 'system:time_start' property to its minimum and maximum
+    server-side, so only two numbers are fetched whatever the collection size, converts them to
+    human-readable UTC date strings, and prints the range.
     If no dates are found, it prints a warning message.
 
     Returns:
         None
     """
-    dates = smap.aggregate_array("system:time_start").getInfo()
-    if dates:
-        first = datetime.fromtimestamp(dates[0] / 1000, timezone.utc).strftime(
+    stats = smap.reduceColumns(ee.Reducer.minMax(), ["system:time_start"]).getInfo()
+    if stats.get("min") is not None:
+        first = datetime.fromtimestamp(stats["min"] / 1000, timezone.utc).strftime(
             "%Y-%m-%d %H:%M"
         )
-        last = datetime.fromtimestamp(dates[-1] / 1000, timezone.utc).strftime(
+        last = datetime.fromtimestamp(stats["max"] / 1000, timezone.utc).strftime(
             "%Y-%m-%d %H:%M"
         )
         print(f"{first} → {last}")
     else:
         print("⚠️ No images found.")
+
+
+def fetch_collection_info(collection, ttl=3600):
+    """
+    Returns the 'system:time_start' and 'system:index' lists of a collection, memoized on disk.
+
+    Both lists are fetched in a single getInfo() call. The result is stored in `CACHE_DIR` under
+    a hash of the serialized collection, which covers its id, bounds, date window and every other
+    filter or band selection, and is reused for `ttl` seconds, so repeated runs over the same
+    collection skip the round trip. The callers' date window moves with the run date, which changes the
+    key, so entries for past windows are simply no longer looked up.
+
+    Parameters:
+        collection (ee.ImageCollection): The filtered collection to describe.
+        ttl (int): Seconds a cached entry stays valid. Defaults to one hour.
+
+    Returns:
+        dict: {"times": [int, ...], "ids": [str, ...]}
+    """
+    key = hashlib.sha1(collection.serialize().encode("utf-8")).hexdigest()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with shelve.open(os.path.join(CACHE_DIR, "collection_info")) as cache:
+        entry = cache.get(key)
+        if entry and time.time() - entry[0] < ttl:
+            return entry[1]
+        info = ee.Dictionary(
+            {
+                "times": collection.aggregate_array("system:time_start"),
+                "ids": collection.aggregate_array("system:index"),
+            }
+        ).getInfo()
+        cache[key] = (time.time(), info)
+        return info
+
+
+def write_csv(path, rows):
+    """
+    Writes report rows to a CSV file with the standard library writer.
+
+    The reports hold a handful of rows, so this avoids importing and building a pandas
+    DataFrame just to serialize them. The parent directory is created if needed.
+
+    Parameters:
+        path (str | Path): Destination CSV path, usually under `EXPORTS_DIR`.
+        rows (list[dict]): Rows keyed by `CSV_FIELDS`; None values are written as empty cells.
+
+    Returns:
+        None
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@lru_cache(maxsize=1)
+def zoi_area_km2():
+    """
+    Returns the area of the ZOI in km², computed by Earth Engine on the first call only.
+
+    Returns:
+        float: The ZOI area in square kilometres.
+    """
+    return zoi.area().getInfo() / 1e6
+
+
+if __name__ == "__main__":
+    # Vérifie d'abord que le fichier existe
+    # Lecture + debug facultatif
+    print(os.path.isfile(SERVICE_ACCOUNT_PATH))
+
+    with open(SERVICE_ACCOUNT_PATH, "r", encoding="utf-8") as sa_file:
+        data = json.load(sa_file)
+        print("== Service Account Debug ==")
+        print(f"type: {data.get('type')}")
+        print(f"client_email: {data.get('client_email')}")
+        print(f"project_id: {data.get('project_id')}")
+        print(f"private_key_id: {data.get('private_key_id')[:8]}...")
+        print("===========================")
+
+    print(f"Area: {zoi_area_km2():.2f} km²")
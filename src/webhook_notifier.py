@@ -8,12 +8,29 @@ Functions:
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from dotenv import load_dotenv
 
 load_dotenv()
 
 webhook_url = os.getenv("WEBHOOK_URL")
 
+# Keep-alive session so repeated notifications reuse one TCP + TLS connection
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    ),
+)
+_SESSION.mount("http://", _SESSION.get_adapter("https://"))
+
+# (connect, read) timeout in seconds
+_TIMEOUT = (5, 30)
+
 
 def send_webhook_notification(date_str):
     """
@@ -28,7 +45,8 @@ def send_webhook_notification(date_str):
     Behavior:
         - If the WEBHOOK_URL environment variable is not set,
         the function returns without sending a notification.
-        - Sends a POST request with a JSON payload containing the status and date.
+        - Sends a POST request with a JSON payload containing the status and date, over a shared
+        keep-alive session that retries transient connection failures.
         - Prints the status code of the response if successful.
         - Prints an error message if the request fails.
 
@@ -41,7 +59,7 @@ def send_webhook_notification(date_str):
         return
     try:
         payload = {"status": "new_data_available", "date": date_str}
-        r = requests.post(webhook_url, json=payload, timeout=2000)
+        r = _SESSION.post(webhook_url, json=payload, timeout=_TIMEOUT)
         print(f"📡 Webhook sent: {r.status_code}")
     except requests.RequestException as e:
         print(f"❌ Webhook failed: {e}")